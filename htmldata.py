@@ -10,7 +10,7 @@ Features:
    This allows you to read and write HTML documents
    programmably, with much flexibility.
  - Extract and modify URLs in an HTML document.
- - Compatible with Python 2.0 - 2.5.
+ - Compatible with Python 3.
 
 See the L{examples} for a quick start.
 
@@ -21,32 +21,39 @@ __version__ = '1.1.1'
 __all__ = ['examples', 'tagextract', 'tagjoin', 'urlextract',
            'urljoin', 'URLMatch']
 
-# Define True and False for Python < 2.2.
-import sys
-if sys.version_info[:3] < (2, 2, 0):
-  exec("True = 1; False = 0")
-
 # -------------------------------------------------------------------
 # Globals
 # -------------------------------------------------------------------
 
+import functools
 import re
-import shlex
 import string
-import urllib.request, urllib.parse, urllib.error
+import sys
 import urllib.parse
-import types
 
 # Translate text between these strings as plain text (not HTML).
 _IGNORE_TAGS = [('script', '/script'),
                ('style',  '/style')]
 
-# Special tags where we have to look for _END_X as part of the
-# HTML/XHTML parsing rules.
+# Matches the opening tag of any _IGNORE_TAGS entry.  The index of
+# the entry is one less than the number of the matching group.
+_IGNORE_OPEN_RE = re.compile(
+  '<(?:' + '|'.join(['(%s)' % re.escape(a) for (a, b) in _IGNORE_TAGS]) +
+  ')', re.I | re.ASCII)
+
+# Case-insensitive searches for the closing tag of each _IGNORE_TAGS
+# entry.  These spare us from lowercasing the whole document.
+_IGNORE_CLOSE_RE = [re.compile(re.escape('<' + b), re.I | re.ASCII)
+                    for (a, b) in _IGNORE_TAGS]
+
+# Openers of comments and CDATA blocks.  _HTML_TOKEN_RE matches the
+# complete blocks; a token starting with either opener that it did not
+# match is unterminated.
 _BEGIN_COMMENT = '<!--'
-_END_COMMENT   = '-->'
 _BEGIN_CDATA   = '<![CDATA['
-_END_CDATA     = ']]>'
+
+# Either opener, for a single startswith() test.
+_BEGIN_SPECIAL = (_BEGIN_COMMENT, _BEGIN_CDATA)
 
 # Mime types that can be parsed as HTML or HTML-like.
 _HTML_MIMETYPES = ['text/html', 'application/xhtml',
@@ -107,15 +114,15 @@ def tagextract(doc):
   tag name, so that output from L{tagjoin} will be correct HTML/XHTML.
 
   """
-  L = _full_tag_extract(doc)
-  for i in range(len(L)):
-    if isinstance(L[i], _TextTag):
+  ans = []
+  for item in _full_tag_extract(doc):
+    if isinstance(item, _TextTag):
       # _TextTag object.
-      L[i] = L[i].text
+      ans.append(item.text)
     else:
-      # _HTMLTag object.
-      L[i] = (L[i].name, L[i].attrs)
-  return L
+      # _HTMLTag object.  Copy attrs, since the tag may be cached.
+      ans.append((item.name, dict(item.attrs)))
+  return ans
 
 def _is_str(s):
   """
@@ -123,6 +130,22 @@ def _is_str(s):
   """
   return hasattr(s, 'capitalize')
 
+def _quote_attr(key, value):
+  """
+  Helper routine: Format a C{key=value} pair for L{tagjoin}.
+
+  The value is placed in double quotes, or in single quotes if it
+  contains a double quote.  A value of C{None} gives just the key.
+  """
+  if value is None:
+    return key
+  if '"' in value:
+    if "'" in value:
+      raise ValueError('attribute value contains both single' +
+                       ' and double quotes')
+    return "%s='%s'" % (key, value)
+  return '%s="%s"' % (key, value)
+
 def tagjoin(L):
   """
   Convert data structure back to HTML.
@@ -162,45 +185,128 @@ def tagjoin(L):
         name = name[:-1]
       else:
         rslash = ''
-      tag_items = []
-      items = list(d.items())
-      items.sort()
+      ans.append('<')
+      ans.append(name)
+      # Most tags have at most one attribute, so only sort if needed.
+      if len(d) > 1:
+        items = sorted(d.items())
+      else:
+        items = d.items()
       for (key, value) in items:
-        if value != None:
-          if '"' in value and "'" in value:
-            raise ValueError('attribute value contains both single' +
-                             ' and double quotes')
-          elif '"' in value:
-            tag_items.append(key + "='" + value + "'")
-          else:
-            tag_items.append(key + '="' + value + '"')
-        else:
-          tag_items.append(key)
-      tag_items = ' '.join(tag_items)
-      if tag_items != '':
-        tag_items = ' ' + tag_items
-      ans.append('<' + name + tag_items + rslash + '>')
+        ans.append(' ')
+        ans.append(_quote_attr(key, value))
+      ans.append(rslash)
+      ans.append('>')
   return ''.join(ans)
 
-def _enumerate(L):
-  """
-  Like C{enumerate}, provided for compatibility with Python < 2.3.
+# Characters which may end or start a quoted value in an HTML tag.
+_TAG_DELIM_RE = re.compile(r'''["'>]''')
 
-  Returns a list instead of an iterator.
+def _tag_end(s, i):
   """
-  return list(zip(list(range(len(L))),L))
+  Helper routine: Find the C{'>'} closing the HTML tag at C{s[i]}.
 
-def _ignore_tag_index(s, i):
+  Returns the index of the C{'>'}, or C{-1} if the tag is never
+  closed.  A C{'>'} inside a quoted value does not close the tag.
+  """
+  i2 = s.find('>', i+1)
+  if i2 < 0:
+    return -1
+
+  # Quotes only matter if one occurs before the first '>'.
+  quot1 = s.find("'", i+1, i2)
+  quot2 = s.find('"', i+1, i2)
+  if quot1 < 0 and quot2 < 0:
+    return i2
+  if quot1 < 0 or (quot2 >= 0 and quot2 < quot1):
+    quot1 = quot2
+
+  # Hop between quotes and '>' characters.
+  i2 = quot1
+  while True:
+    m = _TAG_DELIM_RE.search(s, i2)
+    if m is None:
+      return -1
+    i2 = m.start()
+    c2 = s[i2]
+    if c2 == '>':
+      return i2
+    # Only start a quoted value if the quote is in a realistic place.
+    if s[i2-1] in ' \t=':
+      i2 = s.find(c2, i2+1)
+      if i2 < 0:
+        return -1
+    i2 += 1
+
+# The next '<' in an HTML document, and the token it starts: a
+# complete comment, a complete CDATA block, or a regular tag without
+# quotes.  Anything else matches only the '<'.  There are no groups,
+# so the regex engine can scan ahead for the literal '<'.
+_HTML_TOKEN_RE = re.compile(
+  r'''<!(?=--).*?-->|<!\[CDATA\[.*?\]\]>|''' +
+  r'''<(?!!--|!\[CDATA\[)[^"'>]*>|<''', re.DOTALL)
+
+def _html_spans(s):
   """
-  Helper routine: Find index within C{_IGNORE_TAGS}, or C{-1}.
+  Helper routine: Generate C{(start, end)} indices of the tags and
+  non-tags in C{s}, in document order.
 
-  If C{s[i:]} begins with an opening tag from C{_IGNORE_TAGS}, return
-  the index.  Otherwise, return C{-1}.
+  The spans are contiguous and cover all of C{s}.  See L{_html_split}.
   """
-  for (j, (a, b)) in _enumerate(_IGNORE_TAGS):
-    if s[i:i+len(a)+1].lower() == '<' + a:
-      return j
-  return -1
+  n = len(s)
+  i = 0               # Index of char being processed
+  while i < n:
+    m = _HTML_TOKEN_RE.search(s, i)
+    if m is None:
+      # No left brackets, yield the rest as text.
+      yield (i, n)
+      return
+    i2 = m.start()
+    if i2 > i:
+      # Yield text up to next left bracket.
+      yield (i, i2)
+      i = i2
+
+    i2 = m.end()
+    if i2 - i > 1:
+      if s[i+1] == '!' and s.startswith(_BEGIN_SPECIAL, i):
+        # HTML comment '<!-- ... -->' or XHTML CDATA '<![CDATA[ ... ]]>'.
+        yield (i, i2)
+        i = i2
+        continue
+      # Otherwise a regular HTML tag without quotes.
+    elif s.startswith(_BEGIN_SPECIAL, i):
+      # No '-->' or ']]>'.  Yield the remaining malformed content and stop.
+      yield (i, n)
+      return
+    else:
+      # Regular HTML tag with quotes.  Scan for '>'.
+      i2 = _tag_end(s, i)
+      if i2 < 0:
+        # No end '>'.  Yield the rest as text.
+        yield (i, n)
+        return
+      i2 += 1
+
+    # Yield the tag.
+    yield (i, i2)
+
+    # Check whether we found a special ignore tag, eg '<script>'
+    m = _IGNORE_OPEN_RE.match(s, i)
+    i = i2
+    if m is not None:
+      # It's an ignore tag.  Scan for the end tag.
+      m = _IGNORE_CLOSE_RE[m.lastindex - 1].search(s, i)
+      if m is None:
+        # No end tag.  Yield the rest as text.
+        yield (i, n)
+        return
+      else:
+        i2 = m.start()
+        # Yield the text sandwiched between the tags.
+        yield (i, i2)
+        # Catch the closing tag with the next loop iteration.
+        i = i2
 
 def _html_split(s):
   """
@@ -224,95 +330,21 @@ def _html_split(s):
     ' ', '<script language="Javascript">', '</>a', '</script>', 'end']
 
   """
-  s_lower = s.lower()
-  L = []
+  return [s[i:i2] for (i, i2) in _html_spans(s)]
 
-  i = 0               # Index of char being processed
-  while i < len(s):
-    c = s[i]
-    if c == '<':
-      # Left bracket, handle various cases.
-      if s[i:i+len(_BEGIN_COMMENT)].startswith(_BEGIN_COMMENT):
-        # HTML begin comment tag, '<!--'.  Scan for '-->'.
-        i2 = s.find(_END_COMMENT, i)
-        if i2 < 0:
-          # No '-->'.  Append the remaining malformed content and stop.
-          L.append(s[i:])
-          break
-        else:
-          # Append the comment.
-          L.append(s[i:i2+len(_END_COMMENT)])
-          i = i2 + len(_END_COMMENT)
-      elif s[i:i+len(_BEGIN_CDATA)].startswith(_BEGIN_CDATA):
-        # XHTML begin CDATA tag.  Scan for ']]>'.
-        i2 = s.find(_END_CDATA, i)
-        if i2 < 0:
-          # No ']]>'.  Append the remaining malformed content and stop.
-          L.append(s[i:])
-          break
-        else:
-          # Append the CDATA.
-          L.append(s[i:i2+len(_END_CDATA)])
-          i = i2 + len(_END_CDATA)
-      else:
-        # Regular HTML tag.  Scan for '>'.
-        orig_i = i
-        found = False
-        in_quot1 = False
-        in_quot2 = False
-        for i2 in range(i+1, len(s)):
-          c2 = s[i2]
-          if c2 == '"' and not in_quot1:
-            in_quot2 = not in_quot2
-            # Only turn on double quote if it's in a realistic place.
-            if in_quot2 and not in_quot1:
-              if i2 > 0 and s[i2-1] not in [' ', '\t', '=']:
-                in_quot2 = False
-          elif c2 == "'" and not in_quot2:
-            in_quot1 = not in_quot1
-            # Only turn on single quote if it's in a realistic place.
-            if in_quot1 and not in_quot2:
-              if i2 > 0 and s[i2-1] not in [' ', '\t', '=']:
-                in_quot1 = False
-          elif c2 == '>' and (not in_quot2 and not in_quot1):
-            found = True
-            break
-
-        if not found:
-          # No end '>'.  Append the rest as text.
-          L.append(s[i:])
-          break
-        else:
-          # Append the tag.
-          L.append(s[i:i2+1])
-          i = i2 + 1
-
-        # Check whether we found a special ignore tag, eg '<script>'
-        tagi = _ignore_tag_index(s, orig_i)
-        if tagi >= 0:
-          # It's an ignore tag.  Scan for the end tag.
-          i2 = s_lower.find('<' + _IGNORE_TAGS[tagi][1], i)
-          if i2 < 0:
-            # No end tag.  Append the rest as text.
-            L.append(s[i2:])
-            break
-          else:
-            # Append the text sandwiched between the tags.
-            L.append(s[i:i2])
-            # Catch the closing tag with the next loop iteration.
-            i = i2
-    else:
-      # Not a left bracket, append text up to next left bracket.
-      i2 = s.find('<', i)
-      if i2 < 0:
-        # No left brackets, append the rest as text.
-        L.append(s[i:])
-        break
-      else:
-        L.append(s[i:i2])
-      i = i2
+# Attribute tokens recognized by _shlex_split.  The alternation is
+# ordered, so the first alternative that matches at a given index wins.
+_SHLEX_TOKEN_RE = re.compile(
+  r'''[^ \t\n\r\f\v"']+\s*\=\s*"[^"]*"|''' +
+  r'''[^ \t\n\r\f\v"']+\s*\=\s*'[^']*'|''' +
+  r'''[^ \t\n\r\f\v"']+\s*\=\s*[^ \t\n\r\f\v"']*|''' +
+  r'''[^ \t\n\r\f\v"']+''')
 
-  return L
+# A run of whitespace characters, as in string.whitespace.
+_WHITESPACE_RE = re.compile(r'[ \t\n\r\f\v]+')
+
+# Stray quotes and spaces skipped by _shlex_split.
+_SHLEX_SALVAGE_RE = re.compile(r'''["' \t]+''')
 
 def _shlex_split(s):
   """
@@ -337,45 +369,15 @@ def _shlex_split(s):
   ans = []
   i = 0
   while i < len(s):
-    c = s[i]
-    if c in string.whitespace:
+    m = _WHITESPACE_RE.match(s, i)
+    if m:
       # Whitespace.  Add whitespace while found.
-      for i2 in range(i, len(s)):
-        if s[i2] not in string.whitespace:
-          break
-      # Include the entire string if the last char is whitespace.
-      if s[i2] in string.whitespace:
-        i2 += 1
-      ans.append(s[i:i2])
-      i = i2
+      ans.append(m.group())
+      i = m.end()
     else:
-      # Match 'name = "value"'
-      c = re.compile(r'[^ \t\n\r\f\v"\']+\s*\=\s*"[^"]*"')
-      m = c.match(s, i)
-      if m:
-        ans.append(s[i:m.end()])
-        i = m.end()
-        continue
-
-      # Match "name = 'value'"
-      c = re.compile(r'[^ \t\n\r\f\v"\']+\s*\=\s*\'[^\']*\'')
-      m = c.match(s, i)
-      if m:
-        ans.append(s[i:m.end()])
-        i = m.end()
-        continue
-
-      # Match 'name = value'
-      c = re.compile(r'[^ \t\n\r\f\v"\']+\s*\=\s*[^ \t\n\r\f\v"\']*')
-      m = c.match(s, i)
-      if m:
-        ans.append(s[i:m.end()])
-        i = m.end()
-        continue
-
-      # Match 'name'
-      c = re.compile(r'[^ \t\n\r\f\v"\']+')
-      m = c.match(s, i)
+      # Match 'name = "value"', "name = 'value'", 'name = value' or
+      # 'name', in that order of preference.
+      m = _SHLEX_TOKEN_RE.match(s, i)
       if m:
         ans.append(s[i:m.end()])
         i = m.end()
@@ -384,18 +386,16 @@ def _shlex_split(s):
       # Couldn't match anything so far, so it's likely that the page
       # has malformed quotes inside a tag.  Add leading quotes
       # and spaces to the previous field until we see something.
-      subadd = []
-      while i < len(s) and s[i] in ['"', "'", ' ', '\t']:
-        subadd.append(s[i])
-        i += 1
-
-      # Add whatever we could salvage from the situation and move on.
-      if len(subadd) > 0:
-        ans.append(''.join(subadd))
+      m = _SHLEX_SALVAGE_RE.match(s, i)
+      if m:
+        # Add whatever we could salvage from the situation and move on.
+        ans.append(m.group())
+        i = m.end()
       else:
         # We totally failed at matching this character, so add it
         # as a separate item and move on.
         ans.append(s[i])
+        i += 1
 
   return ans
   
@@ -423,7 +423,48 @@ def _test_shlex_split():
   assert _shlex_split('a=5 b=\'9\'c=\'15 dfkdfkj \'d=\'25\' e=4') == \
          ['a=5', ' ', 'b=\'9\'', 'c=\'15 dfkdfkj \'', 'd=\'25\'',    \
           ' ', 'e=4']
+  assert _shlex_split('a="b c') == ['a=', '"', 'b', ' ', 'c']
+  assert _shlex_split('x \'" \ty') == ['x', ' ', '\'" \t', 'y']
+
+
+# Anything in a tag string which _tag_dict_fast cannot handle.
+_TAG_DICT_SLOW_RE = re.compile(r'''["']|\s=|=\s''')
+
+# A run of non-whitespace characters.
+_NON_WHITESPACE_RE = re.compile(r'[^ \t\n\r\f\v]+')
+
+def _tag_dict_fast(s):
+  """
+  Helper routine: Like L{_tag_dict}, for strings without quotes.
+
+  Requires that C{s} contains no quotes and no whitespace next to an
+  C{'='}.  Then each C{key=value} pair or name singleton is a run of
+  non-whitespace characters, and nothing needs stripping.
+  """
+  attrs     = {}
+  key_pos   = {}
+  value_pos = {}
+  for m in _NON_WHITESPACE_RE.finditer(s):
+    item = m.group()
+    (start, end) = m.span()
+    equals = item.find('=')
+    if equals >= 0:
+      # A 'key=value' pair.
+      key = sys.intern(item[:equals].lower())
+      attrs[key]     = item[equals+1:]
+      key_pos[key]   = (start, start + equals)
+      value_pos[key] = (start + equals + 1, end)
+    elif item.isspace():
+      # Non-ASCII whitespace.  Ignore it, as _tag_dict does.
+      pass
+    else:
+      # A single token, like 'blink'.
+      key = sys.intern(item.lower())
+      attrs[key]     = None
+      key_pos[key]   = (start, end)
+      value_pos[key] = (end, end)
 
+  return (attrs, key_pos, value_pos)
 
 def _tag_dict(s):
   """
@@ -444,37 +485,42 @@ def _tag_dict(s):
 
   Raises C{ValueError} for unmatched quotes and other errors.
   """
+  if _TAG_DICT_SLOW_RE.search(s) is None:
+    return _tag_dict_fast(s)
+
   d = _shlex_split(s)
   attrs     = {}
   key_pos   = {}
   value_pos = {}
-  start = 0
+  end = 0
   for item in d:
-    end = start + len(item)
+    (start, end) = (end, end + len(item))
     equals = item.find('=')
     if equals >= 0:
-      # Contains an equals sign.
-      (k1, k2) = (start, start + equals)
-      (v1, v2) = (start + equals + 1, start + len(item))
-
-      # Strip spaces.
-      while k1 < k2 and s[k1] in string.whitespace:   k1 += 1
-      while k1 < k2 and s[k2-1] in string.whitespace: k2 -= 1
-
-      while v1 < v2 and s[v1] in string.whitespace:   v1 += 1
-      while v1 < v2 and s[v2-1] in string.whitespace: v2 -= 1
+      # Contains an equals sign.  Strip spaces from key and value.
+      key_raw   = item[:equals]
+      value_raw = item[equals+1:]
+      key   = key_raw.strip(string.whitespace)
+      value = value_raw.strip(string.whitespace)
+      k1 = start + len(key_raw) - len(key_raw.lstrip(string.whitespace))
+      k2 = k1 + len(key)
+      v1 = (start + equals + 1 + len(value_raw) -
+            len(value_raw.lstrip(string.whitespace)))
+      v2 = v1 + len(value)
 
       # Strip one pair of double quotes around value.
-      if v1 < v2 - 1 and s[v1] == '"' and s[v2-1] == '"':
+      if len(value) > 1 and value[0] == '"' and value[-1] == '"':
+        value = value[1:-1]
         v1 += 1
         v2 -= 1
 
       # Strip one pair of single quotes around value.
-      if v1 < v2 - 1 and s[v1] == "'" and s[v2-1] == "'":
+      if len(value) > 1 and value[0] == "'" and value[-1] == "'":
+        value = value[1:-1]
         v1 += 1
         v2 -= 1
 
-      (key, value) = (s[k1:k2].lower(), s[v1:v2])
+      key = sys.intern(key.lower())
 
       # Drop bad keys and values.
       if '"' in key or "'" in key:
@@ -485,12 +531,12 @@ def _tag_dict(s):
       attrs[key] = value
       key_pos[key]   = (k1, k2)
       value_pos[key] = (v1, v2)
-    elif item.split() == []:
+    elif item.isspace():
       # Whitespace.  Ignore it.
       pass
     else:
       # A single token, like 'blink'.
-      key = item.lower()
+      key = sys.intern(item.lower())
 
       # Drop bad keys.
       if '"' in key or "'" in key:
@@ -499,7 +545,6 @@ def _tag_dict(s):
       attrs[key]     = None
       key_pos[key]   = (start, end)
       value_pos[key] = (end, end)
-    start = end
 
   return (attrs, key_pos, value_pos)
 
@@ -522,9 +567,84 @@ def _test_tag_dict():
   assert a == {'text': 'hi you', 'bg': 'val', 'e': '5', 'name': None}
   for key in list(a.keys()):
     assert s[b[key][0]:b[key][1]] == key
-    if a[key] != None:
+    if a[key] is not None:
+      assert s[c[key][0]:c[key][1]] == a[key]
+  # Dropping the stray quote must not shift later positions.
+  s = 'a=b"c d = \'e\' f'
+  (a, b, c) = _tag_dict(s)
+  assert a == {'a': 'b', 'c': None, 'd': 'e', 'f': None}
+  for key in list(a.keys()):
+    assert s[b[key][0]:b[key][1]] == key
+    if a[key] is not None:
       assert s[c[key][0]:c[key][1]] == a[key]
 
+# A single whitespace character, ending the name in a tag.
+_SPACE_RE = re.compile(r'\s')
+
+@functools.lru_cache(maxsize=4096)
+def _parse_tag(text):
+  """
+  Helper routine: Parse a regular HTML tag, such as C{'<a href=x>'}.
+
+  Returns C{(name, attrs, key_pos, value_pos)}, as stored in an
+  L{_HTMLTag}, except that positions are relative to the start of
+  C{text}.
+
+  Results are cached, since documents tend to repeat the same tags
+  many times.  The returned dicts must not be modified.
+  """
+  # Strip off '<' and '>' (and a trailing '/').
+  if text[-2] == '/':
+    rslash = True
+    text = text[1:-2]
+  else:
+    rslash = False
+    text = text[1:-1]
+
+  m = _SPACE_RE.search(text)
+  first_space = -1
+  if m:
+    first_space = m.start()
+  if first_space < 0:
+    (name, dtext) = (text, '')
+  else:
+    name  = text[:first_space]
+    dtext = text[first_space+1:]
+
+  # Position of dtext relative to original text.
+  dtext_offset = len(name) + 2    # +2 for '<' and space.
+
+  # Lowercase everything except XML directives and comments.  The
+  # name was split at the first whitespace, so it needs no strip().
+  if not name.startswith(('!', '?')):
+    name = name.lower()
+
+  if rslash:
+    name += '/'
+
+  # Tag names repeat throughout a document, so share one copy.
+  name = sys.intern(name)
+
+  if not dtext:
+    # A bare tag such as '<p>' or '</div>'.  No attributes to parse.
+    return (name, {}, {}, {})
+
+  # Strip off spaces, and update dtext_offset as appropriate.
+  stripped = dtext.lstrip()
+  dtext_offset += len(dtext) - len(stripped)
+  dtext = stripped.rstrip()
+
+  (attrs, key_pos, value_pos) = _tag_dict(dtext)
+  # Make offsets in key_pos and value_pos relative to text.
+  for key in list(attrs.keys()):
+    key_pos[key]   = (key_pos[key][0]+dtext_offset,
+                      key_pos[key][1]+dtext_offset)
+    value_pos[key] = (value_pos[key][0]+dtext_offset,
+                      value_pos[key][1]+dtext_offset)
+
+  return (name, attrs, key_pos, value_pos)
+
+@functools.lru_cache(maxsize=8)
 def _full_tag_extract(s):
   """
   Like L{tagextract}, but different return format.
@@ -534,97 +654,41 @@ def _full_tag_extract(s):
   The return format is very inconvenient for manipulating HTML, and
   only will be useful if you want to find the exact locations where
   tags occur in the original HTML document.
+
+  Results are cached, so that calling L{tagextract} and L{urlextract}
+  on the same document parses it only once.  The returned list and
+  its contents must not be modified.
   """
-  L = _html_split(s)
+  L = []
+  for pos in _html_spans(s):
+    (start, end) = pos
+    text = s[start:end]
 
-  # Starting position of each L[i] in s.
-  Lstart = [0] * len(L)
-  for i in range(1, len(L)):
-    Lstart[i] = Lstart[i-1] + len(L[i-1])
+    if len(text) < 2 or text[0] != '<':
+      # Not an HTML tag.  Wrap inside a _TextTag object.
+      L.append(_TextTag(pos, text))
 
-  class NotTagError(Exception): pass
+    elif text[1] == '!' or text[1] == '?':
+      # A special tag such as XML directive or <!-- comment -->
+      L.append(_HTMLTag(pos, text[1:-1].strip(), {}, {}, {}))
 
-  for (i, text) in _enumerate(L):
-    try:
+    elif text[-1] != '>':
+      # Unterminated tag.  Wrap inside a _TextTag object.
+      L.append(_TextTag(pos, text))
 
-      # Is it an HTML tag?
-      is_tag = False
-      if len(text) >= 2 and text[0] == '<' and text[-1] == '>':
-        # Turn HTML tag text into (name, keyword_dict) tuple.
-        is_tag = True
-
-      is_special = False
-      if len(text) >= 2 and (text[1] == '!' or text[1] == '?'):
-        is_special = True
-
-      if is_special:
-        # A special tag such as XML directive or <!-- comment -->
-        pos = (Lstart[i], Lstart[i] + len(L[i]))
-
-        # Wrap inside an _HTMLTag object.
-        L[i] = _HTMLTag(pos, text[1:-1].strip(), {}, {}, {})
-
-      elif is_tag:
-        # If an HTML tag, strip brackets and handle what's left.
-
-        # Strip off '<>' and update offset.
-        orig_offset = 0
-        if len(text) >= 1 and text[0] == '<':
-          text = text[1:]
-          orig_offset = 1
-        if len(text) >= 1 and text[-1] == '>':
-          text = text[:-1]
-
-        if len(text) > 0 and text[-1] == '/':
-          rslash = True
-          text = text[:-1]
-        else:
-          rslash = False
-
-        m = re.search(r'\s', text)
-        first_space = -1
-        if m:
-          first_space = m.start()
-        if first_space < 0:
-          (name, dtext) = (text, '')
-        else:
-          name  = text[:first_space]
-          dtext = text[first_space+1:len(text)]
-
-        # Position of dtext relative to original text.
-        dtext_offset = len(name) + 1 + orig_offset    # +1 for space.
-
-        # Lowercase everything except XML directives and comments.
-        if not name.startswith('!') and not name.startswith('?'):
-          name = name.strip().lower()
-
-        if rslash:
-          name += '/'
-
-        # Strip off spaces, and update dtext_offset as appropriate.
-        orig_dtext = dtext
-        dtext = dtext.strip()
-        dtext_offset += orig_dtext.index(dtext)
-
-        (attrs, key_pos, value_pos) = _tag_dict(dtext)
-        # Correct offsets in key_pos and value_pos.
-        for key in list(attrs.keys()):
-          key_pos[key]   = (key_pos[key][0]+Lstart[i]+dtext_offset,
-                            key_pos[key][1]+Lstart[i]+dtext_offset)
-          value_pos[key] = (value_pos[key][0]+Lstart[i]+dtext_offset,
-                            value_pos[key][1]+Lstart[i]+dtext_offset)
-        
-        pos = (Lstart[i], Lstart[i] + len(L[i]))
- 
-        # Wrap inside an _HTMLTag object.
-        L[i] = _HTMLTag(pos, name, attrs, key_pos, value_pos)
-      else:
-        # Not an HTML tag.
-        raise NotTagError
-    except NotTagError:
-      # Wrap non-HTML strings inside a _TextTag object.
-      pos = (Lstart[i], Lstart[i] + len(L[i]))
-      L[i] = _TextTag(pos, L[i])
+    else:
+      # Regular HTML tag.
+      (name, attrs, key_pos, value_pos) = _parse_tag(text)
+      if attrs:
+        # Shift positions from tag-relative to document-relative.
+        # Tags without attributes share the cached empty dicts.
+        key_pos   = dict([(key, (k1+start, k2+start))
+                          for (key, (k1, k2)) in key_pos.items()])
+        value_pos = dict([(key, (v1+start, v2+start))
+                          for (key, (v1, v2)) in value_pos.items()])
+
+      # Wrap inside an _HTMLTag object.
+      L.append(_HTMLTag(pos, name, attrs, key_pos, value_pos))
 
   return L
 
@@ -677,7 +741,9 @@ class _HTMLTag:
                     >>> '<a href="d.com">'[9:14]
                     'd.com'
   """
-  
+
+  __slots__ = ('pos', 'name', 'attrs', 'key_pos', 'value_pos')
+
   def __init__(self, pos, name, attrs, key_pos, value_pos):
     """
     Create an _HTMLTag object.
@@ -696,6 +762,8 @@ class _TextTag:
   @ivar pos:    C{(start, end)} indices of the text.
   """
 
+  __slots__ = ('pos', 'text')
+
   def __init__(self, pos, text):
     """
     Create a _TextTag object.
@@ -719,16 +787,29 @@ _URL_TAGS = ['a href', 'applet archive', 'applet code',
             'script src', 'table background', 'tbody background',
             'td background', 'tfoot background', 'th background',
             'thead background', 'tr background']
-_URL_TAGS = [tuple(s.split()) for s in _URL_TAGS]
+# Interned, like parsed tag names and keys, so lookups can match by
+# identity.
+_URL_TAGS = [tuple(map(sys.intern, s.split())) for s in _URL_TAGS]
+
+# Maps each tag name in _URL_TAGS to its URL attributes, in order.
+_URL_ATTRS = {}
+for _tag in _URL_TAGS:
+  _URL_ATTRS.setdefault(_tag[0], []).append(_tag[1])
+del _tag
 
 
 def _finditer(pattern, string):
   """
-  Like C{re.finditer}, provided for compatibility with Python < 2.3.
+  Like C{re.finditer}, but resumes after the captured group.
+
+  Each search restarts at the end of the match's last captured group,
+  not at the end of the whole match, so text matched after the group
+  (such as the C{';'} ending an C{@import}) is scanned again.  If that
+  group is empty, the next search starts one character after the
+  previous one.
 
-  Returns a list instead of an iterator.  Otherwise the return format
-  is identical to C{re.finditer} (except possibly in the details of
-  empty matches).
+  Returns a list of match objects.  The pattern may be a string or a
+  compiled regex.
   """
   compiled = re.compile(pattern)
   ans = []
@@ -782,6 +863,37 @@ def _test_remove_comments():
   assert _remove_comments(s) ==                                     \
          'hi           hello                   there!'
 
+# URLs within a CSS stylesheet: url(blah), url('blah'), url("blah"),
+# and the @import forms.  Each alternative captures the URL alone.
+_CSS_URL_RE = re.compile(
+  r'''url\s*\(([^\r\n\("']*?)\)|''' +
+  r'''url\s*\(\s*"([^\r\n]*?)"\s*\)|''' +
+  r'''url\s*\(\s*'([^\r\n]*?)'\s*\)|''' +
+  r'''@import\s+([^ \t\r\n"';@\(\)]+)[^\r\n;@\(\)]*[\r\n;]|''' +
+  r'''@import\s+'([^ \t\r\n"';@\(\)]+)'[^\r\n;@\(\)]*[\r\n;]|''' +
+  r'''@import\s+"([^ \t\r\n"';\(\)']+)"[^\r\n;@\(\)]*[\r\n;]''')
+
+@functools.lru_cache(maxsize=256)
+def _css_urlspans(doc):
+  """
+  Helper routine: Find the URLs in a stylesheet.
+
+  Returns C{(doc2, spans)}, where C{doc2} is C{doc} with comments
+  blanked out, and C{spans} is a tuple of C{(start, end)} indices of
+  the URLs in C{doc2}.
+
+  Results are cached, since pages tend to repeat the same inline
+  C{style} attributes.
+  """
+  doc = _remove_comments(doc)
+  spans = []
+  for m in _finditer(_CSS_URL_RE, doc + ';\n'):
+    s = m.start(m.lastindex)
+    e = min(m.end(m.lastindex), len(doc))
+    if e > s:
+      spans.append((s, e))
+  return (doc, tuple(spans))
+
 def urlextract(doc, siteurl=None, mimetype='text/html'):
   """
   Extract URLs from HTML or stylesheet.
@@ -817,24 +929,9 @@ def urlextract(doc, siteurl=None, mimetype='text/html'):
   """
   mimetype = mimetype.lower()
   if mimetype.split()[0] in _CSS_MIMETYPES:
-    doc = _remove_comments(doc)
     # Match URLs within CSS stylesheet.
-    # Match url(blah) or url('blah') or url("blah").
-    L = _finditer(
-      r'''url\s*\(([^\r\n\("']*?)\)|''' +
-      r'''url\s*\(\s*"([^\r\n]*?)"\s*\)|''' +
-      r'''url\s*\(\s*'([^\r\n]*?)'\s*\)|''' +
-      r'''@import\s+([^ \t\r\n"';@\(\)]+)[^\r\n;@\(\)]*[\r\n;]|''' +
-      r'''@import\s+'([^ \t\r\n"';@\(\)]+)'[^\r\n;@\(\)]*[\r\n;]|''' + 
-      r'''@import\s+"([^ \t\r\n"';\(\)']+)"[^\r\n;@\(\)]*[\r\n;]''',
-      doc + ';\n')
-
-    L = [(x.start(x.lastindex), x.end(x.lastindex)) for x in L]
-    ans = []
-    for (s, e) in L:
-      e = min(e, len(doc))
-      if e > s:
-        ans.append(URLMatch(doc, s, e, siteurl, False, True))
+    (doc, spans) = _css_urlspans(doc)
+    ans = [URLMatch(doc, s, e, siteurl, False, True) for (s, e) in spans]
   elif mimetype.split()[0] in _HTML_MIMETYPES:
     # Match URLs within HTML document.
     ans = []
@@ -852,10 +949,11 @@ def urlextract(doc, siteurl=None, mimetype='text/html'):
           # And previous item is <style>.  Process a stylesheet.
           temp = urlextract(item.text, siteurl, 'text/css')
           # Offset indices and add to ans.
-          for j in range(len(temp)):
-            temp[j].start += item.pos[0]
-            temp[j].end   += item.pos[0]
-          ans += temp
+          base = item.pos[0]
+          for u in temp:
+            u.start += base
+            u.end   += base
+          ans.extend(temp)
         else:
           # Regular text.  Ignore.
           pass
@@ -865,21 +963,24 @@ def urlextract(doc, siteurl=None, mimetype='text/html'):
           # Process a stylesheet embedded in the 'style' attribute.
           temp = urlextract(item.attrs['style'], siteurl, 'text/css')
           # Offset indices and add to ans.
-          for j in range(len(temp)):
-            temp[j].start += item.value_pos['style'][0]
-            temp[j].end   += item.value_pos['style'][0]
-          ans += temp
-
-        for (a, b) in _URL_TAGS:
-          if item.name.startswith(a) and b in list(item.attrs.keys()):
+          base = item.value_pos['style'][0]
+          for u in temp:
+            u.start += base
+            u.end   += base
+          ans.extend(temp)
+
+        # Strip every trailing '/', as in '<img/ src=x />' ('img//').
+        name = item.name.rstrip('/')
+        for b in _URL_ATTRS.get(name, ()):
+          if b in item.attrs:
             # Got one URL.
             url = item.attrs[b]
             # FIXME: Some HTML tag wants a URL list, look up which
             # tag and make it a special case.
             (start, end) = item.value_pos[b]
-            tag_name  = a
+            tag_name  = name
             tag_attr  = b
-            tag_attrs = item.attrs
+            tag_attrs = dict(item.attrs)
             tag_index = i
             tag = URLMatch(doc, start, end, siteurl, True, False,    \
                            tag_attr, tag_attrs, tag_index, tag_name)
@@ -910,31 +1011,23 @@ def _tuple_replace(s, Lindices, Lreplace):
    >>> _tuple_replace('0123456789',[(4,5),(6,9)],['abc', 'def'])
    '0123abc5def9'
   """
-  ans = []
-  Lindices = Lindices[:]
-  Lindices.sort()
   if len(Lindices) != len(Lreplace):
     raise ValueError('lists differ in length')
-  for i in range(len(Lindices)-1):
-    if Lindices[i][1] > Lindices[i+1][0]:
-      raise ValueError('tuples overlap')
-    if Lindices[i][1] < Lindices[i][0]:
-      raise ValueError('invalid tuple')
-    if min(Lindices[i][0], Lindices[i][1]) < 0 or                    \
-       max(Lindices[i][0], Lindices[i][1]) >= len(s):
-      raise ValueError('bad index')
+  pairs = list(zip(Lindices, Lreplace))
+  pairs.sort(key=lambda pair: pair[0])
 
+  ans = []
   j = 0
-  offset = 0
-  for i in range(len(Lindices)):
-    
-    len1 = Lindices[i][1] - Lindices[i][0]
-    len2 = len(Lreplace[i])
-
-    ans.append(s[j:Lindices[i][0]+offset])
-    ans.append(Lreplace[i])
-
-    j = Lindices[i][1]
+  for ((start, end), replace) in pairs:
+    if start < 0 or end > len(s):
+      raise ValueError('bad index')
+    if end < start:
+      raise ValueError('invalid tuple')
+    if start < j:
+      raise ValueError('tuples overlap')
+    ans.append(s[j:start])
+    ans.append(replace)
+    j = end
   ans.append(s[j:])
   return ''.join(ans)
 
@@ -949,6 +1042,20 @@ def _test_tuple_replace():
   assert _tuple_replace('01234567890123456789',                      \
          [(1,9),(13,14),(16,18)],['abcd','efg','hijk']) ==           \
          '0abcd9012efg45hijk89'
+  assert _tuple_replace('0123456789',[(6,9),(4,5)],['def', 'abc'])== \
+         '0123abc5def9'
+  assert _tuple_replace('0123456789',[(7,10)],['abc']) == '0123456abc'
+  for (Lindices, Lreplace, msg) in [
+      ([(4,5)], [], 'lists differ in length'),
+      ([(4,6),(5,7)], ['a','b'], 'tuples overlap'),
+      ([(5,4)], ['a'], 'invalid tuple'),
+      ([(8,11)], ['a'], 'bad index'),
+      ([(-1,2)], ['a'], 'bad index')]:
+    try:
+      _tuple_replace('0123456789', Lindices, Lreplace)
+      assert False
+    except ValueError as e:
+      assert str(e) == msg
 
 def urljoin(s, L):
   """
@@ -982,11 +1089,11 @@ def examples():
  
   Here we use L{urlextract} to obtain all URLs in the document.
 
-   >>> import urllib2, htmldata
+   >>> import urllib.request, htmldata
    >>> url = 'http://www.google.com/'
-   >>> contents = urllib2.urlopen(url).read()
+   >>> contents = urllib.request.urlopen(url).read().decode()
    >>> for u in htmldata.urlextract(contents, url):
-   ...   print u.url
+   ...   print(u.url)
    ...
    http://www.google.com/images/logo.gif
    http://www.google.com/search
@@ -999,12 +1106,12 @@ def examples():
   Print all image URLs from Google in relative form.
 
 
-   >>> import urllib2, htmldata
+   >>> import urllib.request, htmldata
    >>> url = 'http://www.google.com/'
-   >>> contents = urllib2.urlopen(url).read()
+   >>> contents = urllib.request.urlopen(url).read().decode()
    >>> for u in htmldata.urlextract(contents):
    ...   if u.tag_name == 'img':
-   ...     print u.url
+   ...     print(u.url)
    ...
    /images/logo.gif
 
@@ -1020,9 +1127,9 @@ def examples():
   and then loop over the in-order list of tags (items which are not
   tuples are plain text, which is ignored).
 
-   >>> import urllib2, htmldata
+   >>> import urllib.request, htmldata
    >>> url = 'http://www.google.com/'
-   >>> contents = urllib2.urlopen(url).read()
+   >>> contents = urllib.request.urlopen(url).read().decode()
    >>> L = htmldata.tagextract(contents)
    >>> for item in L:
    ...   if isinstance(item, tuple) and item[0] == 'a':
@@ -1035,18 +1142,18 @@ def examples():
   Example 4:
   Make all URLs on an HTML document be absolute.
 
-   >>> import urllib2, htmldata
+   >>> import urllib.request, htmldata
    >>> url = 'http://www.google.com/'
-   >>> contents = urllib2.urlopen(url).read()
+   >>> contents = urllib.request.urlopen(url).read().decode()
    >>> htmldata.urljoin(htmldata.urlextract(contents, url))
    (Google HTML page with absolute URLs)
 
   Example 5:
   Properly quote all HTML tag values for pedants.
 
-   >>> import urllib2, htmldata
+   >>> import urllib.request, htmldata
    >>> url = 'http://www.google.com/'
-   >>> contents = urllib2.urlopen(url).read()
+   >>> contents = urllib.request.urlopen(url).read().decode()
    >>> htmldata.tagjoin(htmldata.tagextract(contents))
    (Properly quoted version of the original HTML)
 
@@ -1054,9 +1161,9 @@ def examples():
   Modify all URLs in a document so that they are appended
   to our proxy CGI script C{http://mysite.com/proxy.cgi}.
 
-   >>> import urllib2, htmldata
+   >>> import urllib.request, htmldata
    >>> url = 'http://www.google.com/'
-   >>> contents = urllib2.urlopen(url).read()
+   >>> contents = urllib.request.urlopen(url).read().decode()
    >>> proxy_url = 'http://mysite.com/proxy.cgi?url='
    >>> L = htmldata.urlextract(contents)
    >>> for u in L:
@@ -1068,29 +1175,41 @@ def examples():
   Example 7:
   Download all images from a website.
 
-   >>> import urllib, htmldata, time
+   >>> import urllib.parse, urllib.request, htmldata, time
    >>> url = 'http://www.google.com/'
-   >>> contents = urllib.urlopen(url).read()
+   >>> contents = urllib.request.urlopen(url).read().decode()
    >>> for u in htmldata.urlextract(contents, url):
    ...   if u.tag_name == 'img':
-   ...     filename = urllib.quote_plus(u.url)
-   ...     urllib.urlretrieve(u.url, filename)
+   ...     filename = urllib.parse.quote_plus(u.url)
+   ...     urllib.request.urlretrieve(u.url, filename)
    ...     time.sleep(0.5)
    ...
    (Images are downloaded to the current directory)
 
   Many sites will protect against bandwidth-draining robots by
   checking the HTTP C{Referer} [sic] and C{User-Agent} fields.
-  To circumvent this, one can create a C{urllib2.Request} object
-  with a legitimate C{Referer} and a C{User-Agent} such as
+  To circumvent this, one can create a C{urllib.request.Request}
+  object with a legitimate C{Referer} and a C{User-Agent} such as
   C{"Mozilla/4.0 (compatible; MSIE 5.5)"}.  Then use
-  C{urllib2.urlopen} to download the content.  Be warned that some
-  website operators will respond to rapid robot requests by banning
-  the offending IP address.
+  C{urllib.request.urlopen} to download the content.  Be warned that
+  some website operators will respond to rapid robot requests by
+  banning the offending IP address.
 
   """
   print(examples.__doc__)
 
+
+@functools.lru_cache(maxsize=4096)
+def _cached_urljoin(base, url):
+  """
+  Helper routine: Like C{urllib.parse.urljoin}, but memoized.
+
+  Pages tend to repeat the same relative links (navigation menus,
+  images), all resolved against a single site URL.
+  """
+  return urllib.parse.urljoin(base, url)
+
+
 class URLMatch:
   """
   A matched URL inside an HTML document or stylesheet.
@@ -1135,8 +1254,8 @@ class URLMatch:
     self.in_html = in_html
     self.in_css  = in_css
 
-    if siteurl != None:
-      self.url = urllib.parse.urljoin(siteurl, self.url)
+    if siteurl is not None:
+      self.url = _cached_urljoin(siteurl, self.url)
 
     self.tag_attr  = tag_attr
     self.tag_attrs = tag_attrs
@@ -1185,9 +1304,8 @@ def _test_tagextract(str_class=str):
   Strings are cast to the string class argument str_class.
   """
 
-  # Work around lack of nested scopes in Python <= 2.1.
-  def f(obj, str_class2=str_class):
-    return _cast_to_str(obj, str_class2)
+  def f(obj):
+    return _cast_to_str(obj, str_class)
 
   # Simple HTML document to test.
   doc1 = f('\n\n<Html><BODY bgcolor=#ffffff>Hi<h1>Ho</h1><br>' +
@@ -1255,10 +1373,24 @@ def _test_tagextract(str_class=str):
    '<![CDATA[ more and weirder<bar> ] ][]]>', '<![C[DATA[[>',
    '<abc key=value>', '<![CDATA[to eof'])
 
+  s = f('<p><SCRIPT>var a = 1 < 2;</Script ><style>a<b')
+  assert s == f('').join(_html_split(s))
+  assert _html_split(s) == f(
+  ['<p>', '<SCRIPT>', 'var a = 1 < 2;', '</Script >', '<style>', 'a<b'])
+
   # -----------------------------------------------------------------
   # Test tagextract() and tagjoin()
   # -----------------------------------------------------------------
 
+  # Test that text is never mistaken for a special tag.
+  assert tagextract(f('<p>x?</p>a!')) == f(
+         [('p', {}), 'x?', ('/p', {}), 'a!'])
+
+  # Test that modifying the output does not affect later calls.
+  L = tagextract(f('<a href=x>'))
+  L[0][1]['href'] = f('y')
+  assert tagextract(f('<a href=x>')) == f([('a', {'href': 'x'})])
+
   # Test for whitespace handling in tags.
   assert (tagextract('<a\n\t\t\t\v\rhref="a.png"\tsize=10>') == 
           [('a', {'href': 'a.png', 'size': '10'})])
@@ -1318,12 +1450,12 @@ def _test_tagextract(str_class=str):
             doc1.replace(f('"'), f("'")), doc2.replace(f('"'), f("'")),
             doc3.replace(f('"'), f("'"))]:
     L = _full_tag_extract(s)
-    for (i, item) in _enumerate(L):
+    for (i, item) in enumerate(L):
       if isinstance(item, _HTMLTag):
         for key in list(item.attrs.keys()):
           assert s[item.key_pos[key][0]:item.key_pos[key][1]].lower()\
                  == key
-          if item.attrs[key] != None:
+          if item.attrs[key] is not None:
             assert s[item.value_pos[key][0]:item.value_pos[key][1]]  \
                    == item.attrs[key]
 
@@ -1386,9 +1518,8 @@ def _test_urlextract(str_class=str):
   Strings are cast to the string class argument str_class.
   """
 
-  # Work around lack of nested scopes in Python <= 2.1.
-  def f(obj, str_class2=str_class):
-    return _cast_to_str(obj, str_class2)
+  def f(obj):
+    return _cast_to_str(obj, str_class)
 
   doc1 = f('urlblah, url ( blah2, url( blah3) url(blah4) ' +
          'url("blah5") hum("blah6") url)"blah7"( url ( " blah8 " );;')
@@ -1484,51 +1615,47 @@ def _test_urlextract(str_class=str):
   assert L2 == f(['foo', 'a.gif', 'bar.css', 'b.html'])
   assert [s[x.start:x.end] == x.url for x in L].count(False) == 0
 
-def _python_has_unicode():
-  """
-  True iff Python was compiled with unicode().
-  """
-  try:
-    str
-    return True
-  except:
-    return False
+  # Test urljoin() with URLs listed out of document order.
+  L = urlextract(s)
+  for x in L:
+    x.url = x.url.upper()
+  assert urljoin(s, L) == f(
+         '<html><img src="A.GIF" alt="b" style="url(\'FOO\')">' +
+         '<a href = B.HTML name="c" style="@import \'BAR.CSS\'">')
+
+  # Test that tag names must match exactly.
+  s = f('<area href=x><abbr href=y><img src=z />')
+  L = urlextract(s)
+  assert [x.url for x in L] == f(['x', 'z'])
+  assert [x.tag_name for x in L] == f(['area', 'img'])
+  for (s, name) in [('<a/ href=x/>', 'a'), ('<img/ src=x />', 'img')]:
+    L = urlextract(f(s))
+    assert [(x.url, x.tag_name) for x in L] == [(f('x'), f(name))]
 
 
 # -------------------------------------------------------------------
 # Unit Test Main Routine
 # -------------------------------------------------------------------
 
+# Unit tests run by _test(), with the label reported for each.
+_TESTS = [(_test_remove_comments,              '_remove_comments'),
+          (_test_shlex_split,                  '_shlex_split'),
+          (_test_tag_dict,                     '_tag_dict'),
+          (_test_tuple_replace,                '_tuple_replace'),
+          (_test_tagextract,                   'tagextract*'),
+          (_test_urlextract,                   'urlextract*')]
+
 def _test():
   """
   Unit test main routine.
   """
-  print('Unit tests:')
-  _test_remove_comments()
-  print('  _remove_comments:       OK')
-  _test_shlex_split()
-  print('  _shlex_split:           OK')
-  _test_tag_dict()
-  print('  _tag_dict:              OK')
-  _test_tuple_replace()
-  print('  _tuple_replace:         OK')
-
-  _test_tagextract()
-  print('  tagextract*:            OK')
-
-  if _python_has_unicode():
-    _test_tagextract(str)
-    print('  tagextract (unicode)*:  OK')
-
-  _test_urlextract()
-  print('  urlextract*:            OK')
-
-  if _python_has_unicode():
-    _test_urlextract(str)
-    print('  urlextract (unicode)*:  OK')
-
-  print()
-  print('* The corresponding join method has been tested as well.')
+  out = ['Unit tests:']
+  for (test, label) in _TESTS:
+    test()
+    out.append('  %-24sOK' % (label + ':'))
+  out.append('')
+  out.append('* The corresponding join method has been tested as well.')
+  sys.stdout.write('\n'.join(out) + '\n')
 
 
 if __name__ == '__main__':